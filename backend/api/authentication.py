@@ -0,0 +1,105 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TTLCache:
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [
+                key for key, (value, _) in self._data.items()
+                if predicate(value)
+            ]:
+                del self._data[key]
+
+
+local_token_cache = TTLCache(
+    settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TIMEOUT
+)
+
+
+def get_shared_cache():
+    alias = settings.TOKEN_AUTH_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def shared_cache_key(key):
+    return f'auth_token:{key}'
+
+
+def invalidate_token(key):
+    shared_cache = get_shared_cache()
+    if shared_cache is None:
+        local_token_cache.delete(key)
+    else:
+        shared_cache.delete(shared_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    shared_cache = get_shared_cache()
+    if shared_cache is None:
+        local_token_cache.delete_where(
+            lambda credentials: credentials[0].pk == user_id
+        )
+    else:
+        shared_cache.delete_many([
+            shared_cache_key(key) for key in Token.objects.filter(
+                user_id=user_id
+            ).values_list('key', flat=True)
+        ])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        shared_cache = get_shared_cache()
+        if shared_cache is None:
+            credentials = local_token_cache.get(key)
+        else:
+            credentials = shared_cache.get(shared_cache_key(key))
+        if credentials is not None:
+            return copy.deepcopy(credentials)
+
+        credentials = super().authenticate_credentials(key)
+        if shared_cache is None:
+            local_token_cache.set(key, copy.deepcopy(credentials))
+        else:
+            shared_cache.set(
+                shared_cache_key(key),
+                credentials,
+                settings.TOKEN_AUTH_CACHE_TIMEOUT
+            )
+        return credentials
@@ -0,0 +1,58 @@
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(request, *parts):
+    return quote_etag(hashlib.sha1(repr((
+        request.accepted_media_type, request.build_absolute_uri('/'), parts
+    )).encode()).hexdigest())
+
+
+def recipe_version_parts(recipe):
+    author = recipe.author
+    return (
+        recipe.pk,
+        recipe.updated_at.isoformat(),
+        author.pk,
+        author.username,
+        author.first_name,
+        author.last_name,
+        author.email,
+        author.profile_image.name,
+    )
+
+
+def recipe_etag_parts(recipe):
+    return recipe_version_parts(recipe) + (
+        getattr(recipe, 'is_favorited', False),
+        getattr(recipe, 'is_in_shopping_cart', False),
+        getattr(recipe, 'author_is_subscribed', False),
+    )
+
+
+def conditional_response(
+    request, get_response, etag, last_modified=None, max_age=0
+):
+    timestamp = (
+        int(last_modified.timestamp()) if last_modified is not None else None
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = get_response()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    patch_vary_headers(response, ('Authorization',))
+    return response
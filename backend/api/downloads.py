@@ -1,52 +1,200 @@
+import csv
+import os
+import tempfile
+import uuid
 from io import BytesIO
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Sum
-from reportlab.lib.pagesizes import letter
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
-from recipes.models import Ingredient
-
-
-def generate_shopping_list_txt(user):
-    ingredients = Ingredient.objects.filter(
-        used_in__recipe__shoppingcart__user=user
-    ).values('title', 'unit').annotate(total=Sum('used_in__quantity'))
-    lines = [
-        f"{item['title']} ({item['unit']}) — {item['total']}"
-        for item in ingredients
-    ]
-    content = "".join(lines)
-    response = HttpResponse(content, content_type='text/plain')
-    response[
-        'Content-Disposition'
-    ] = 'attachment; filename="shopping_list.txt"'
-    return response
+from recipes.models import Ingredient, ShoppingCart
+
+
+SHOPPING_LIST_TITLE = 'Список покупок'
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+FONT_NAME = 'ShoppingCartFont'
+FALLBACK_FONT_NAME = 'Helvetica'
+FONT_SIZE = 12
+TITLE_FONT_SIZE = 16
+LINE_HEIGHT = 18
+PAGE_MARGIN = 50
+PDF_SPOOL_SIZE = 1024 * 1024
+CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+def get_shopping_list(user):
+    return Ingredient.objects.filter(
+        used_in__recipe__shopping_cart_items__user=user
+    ).values(
+        'name', 'measurement_unit'
+    ).annotate(total=Sum('used_in__amount')).order_by('name')
+
+
+def cart_version_key(user_id):
+    return f'shopping_cart:version:{user_id}'
+
+
+def get_cart_version(user_id):
+    version = cache.get(cart_version_key(user_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(cart_version_key(user_id), version, None):
+            version = cache.get(cart_version_key(user_id), version)
+    return version
+
+
+def bump_cart_versions(user_ids):
+    cache.set_many(
+        {cart_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+        None
+    )
+
+
+def bump_recipe_carts(recipe_ids):
+    bump_cart_versions(set(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True)))
+
+
+def get_cached_shopping_list(user, version):
+    key = f'shopping_cart:items:{user.id}:{version}'
+    items = cache.get(key)
+    if items is None:
+        items = list(get_shopping_list(user))
+        cache.set(key, items, settings.SHOPPING_CART_CACHE_TIMEOUT)
+    return items
+
+
+def format_item(item):
+    return f"{item['name']} ({item['measurement_unit']}) — {item['total']}"
+
+
+def iter_txt(items):
+    for item in items:
+        yield f'{format_item(item)}\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for item in items:
+        yield writer.writerow(
+            (item['name'], item['measurement_unit'], item['total'])
+        )
+
+
+def get_font_name():
+    if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return FONT_NAME
+    if not os.path.exists(settings.SHOPPING_CART_FONT_PATH):
+        return FALLBACK_FONT_NAME
+    pdfmetrics.registerFont(
+        TTFont(FONT_NAME, settings.SHOPPING_CART_FONT_PATH)
+    )
+    return FONT_NAME
+
+
+def write_pdf(items, file):
+    font_name = get_font_name()
+    width, height = A4
+    text_width = width - 2 * PAGE_MARGIN
+    pdf = canvas.Canvas(file, pagesize=A4)
+    pdf.setTitle(SHOPPING_LIST_TITLE)
+    page = 1
+
+    def start_page():
+        pdf.setFont(font_name, FONT_SIZE)
+        pdf.drawRightString(
+            width - PAGE_MARGIN, PAGE_MARGIN / 2, str(page)
+        )
+        return height - PAGE_MARGIN
+
+    y = start_page()
+    pdf.setFont(font_name, TITLE_FONT_SIZE)
+    pdf.drawString(PAGE_MARGIN, y, SHOPPING_LIST_TITLE)
+    pdf.setFont(font_name, FONT_SIZE)
+    y -= 2 * LINE_HEIGHT
+
+    for item in items:
+        for line in simpleSplit(
+            format_item(item), font_name, FONT_SIZE, text_width
+        ):
+            if y < PAGE_MARGIN:
+                pdf.showPage()
+                page += 1
+                y = start_page()
+            pdf.drawString(PAGE_MARGIN, y, line)
+            y -= LINE_HEIGHT
+    pdf.save()
+
+
+def cache_stream(chunks, key):
+    parts = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode()
+        if parts is not None:
+            size += len(data)
+            if size <= settings.SHOPPING_CART_CACHE_MAX_BYTES:
+                parts.append(data)
+            else:
+                parts = None
+        yield data
+    if parts is not None:
+        cache.set(key, b''.join(parts), settings.SHOPPING_CART_CACHE_TIMEOUT)
+
+
+def render_pdf(items, key):
+    file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_SIZE)
+    write_pdf(items, file)
+    if file.tell() <= settings.SHOPPING_CART_CACHE_MAX_BYTES:
+        file.seek(0)
+        cache.set(key, file.read(), settings.SHOPPING_CART_CACHE_TIMEOUT)
+    file.seek(0)
+    return file
+
+
+def shopping_list_response(user, fmt='txt'):
+    if fmt not in CONTENT_TYPES:
+        fmt = 'txt'
+    version = get_cart_version(user.id)
+    key = f'shopping_cart:{fmt}:{user.id}:{version}'
+    filename = f'shopping_list.{fmt}'
+    content = cache.get(key)
+    if content is not None:
+        return FileResponse(
+            BytesIO(content),
+            as_attachment=True,
+            filename=filename,
+            content_type=CONTENT_TYPES[fmt],
+        )
 
+    items = get_cached_shopping_list(user, version)
+    if fmt == 'pdf':
+        return FileResponse(
+            render_pdf(items, key),
+            as_attachment=True,
+            filename=filename,
+            content_type=CONTENT_TYPES[fmt],
+        )
 
-def generate_shopping_list_pdf(user):
-    ingredients = Ingredient.objects.filter(
-        used_in__recipe__shoppingcart__user=user
-    ).values('title', 'unit').annotate(total=Sum('used_in__quantity'))
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    y = 750
-    p.setFont("Helvetica", 12)
-    p.drawString(50, y, "Список покупок:")
-    y -= 25
-
-    for item in ingredients:
-        line = f"{item['title']} ({item['unit']}) — {item['total']}"
-        p.drawString(50, y, line)
-        y -= 20
-        if y < 50:
-            p.showPage()
-            y = 750
-
-    p.save()
-    buffer.seek(0)
-
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response[
-        'Content-Disposition'
-    ] = 'attachment; filename="shopping_list.pdf"'
+    chunks = iter_csv(items) if fmt == 'csv' else iter_txt(items)
+    response = StreamingHttpResponse(
+        cache_stream(chunks, key), content_type=CONTENT_TYPES[fmt]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
@@ -1,8 +1,17 @@
+from django import forms
 from django_filters import rest_framework as filters
 from django_filters import DateFilter, DateFromToRangeFilter
 from recipes.models import Recipe, Ingredient
 
 
+class IntegerFilter(filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
+class IntegerInFilter(filters.BaseInFilter, IntegerFilter):
+    pass
+
+
 class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -13,6 +22,12 @@ class RecipeFilter(filters.FilterSet):
     pub_date_after = DateFilter(field_name='created_at', lookup_expr='gte')
     pub_date_before = DateFilter(field_name='created_at', lookup_expr='lte')
     pub_date_range = DateFromToRangeFilter(field_name='created_at')
+    ingredients = IntegerInFilter(method='filter_ingredients')
+    max_missing = IntegerFilter(method='filter_max_missing')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'popular'), ('trending', 'trending')),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -24,6 +39,9 @@ class RecipeFilter(filters.FilterSet):
             'pub_date_after',
             'pub_date_before',
             'pub_date_range',
+            'ingredients',
+            'max_missing',
+            'ordering',
         ]
 
     def filter_is_favorited(self, queryset, name, value):
@@ -34,6 +52,26 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(favorites__user=user)
         return queryset.exclude(favorites__user=user)
 
+    def filter_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        queryset = queryset.with_ingredient_coverage(value)
+        max_missing = self.form.cleaned_data.get('max_missing')
+        if max_missing is not None:
+            queryset = queryset.filter(ingredients_missing__lte=max_missing)
+        return queryset.order_by(
+            '-ingredients_coverage', '-ingredients_matched', '-pub_date', '-id'
+        )
+
+    def filter_max_missing(self, queryset, name, value):
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        field = 'popularity' if value == 'popular' else 'trending'
+        return queryset.filter(ranking__isnull=False).order_by(
+            f'-ranking__{field}', '-ranking__recipe_id'
+        )
+
     def filter_in_shopping_cart(self, queryset, name, value):
         user = getattr(self.request, 'user', None)
         if not user or not user.is_authenticated:
@@ -0,0 +1,90 @@
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+
+logger = logging.getLogger(__name__)
+
+LIST_VARIANT = 'small'
+DETAIL_VARIANT = 'large'
+AVATAR_VARIANT = 'avatar'
+VARIANT_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+VARIANT_EXTENSION = VARIANT_FORMAT.lower().replace('jpeg', 'jpg')
+
+
+def variant_name(name, variant):
+    root, _ = os.path.splitext(name)
+    return f'{root}_{variant}.{VARIANT_EXTENSION}'
+
+
+def variant_names(name, variants):
+    return [variant_name(name, variant) for variant in variants]
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(
+        buffer,
+        VARIANT_FORMAT,
+        quality=settings.IMAGE_VARIANT_QUALITY,
+        optimize=True,
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(file, variants, overwrite=False):
+    if not file or not file.storage.exists(file.name):
+        return []
+    storage = file.storage
+    pending = {
+        variant: size for variant, size in variants.items()
+        if overwrite or not storage.exists(variant_name(file.name, variant))
+    }
+    if not pending:
+        return []
+    try:
+        with storage.open(file.name) as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image.load()
+    except (OSError, UnidentifiedImageError):
+        logger.warning('Не удалось открыть изображение %s', file.name)
+        return []
+    mode = 'RGBA' if VARIANT_FORMAT == 'WEBP' else 'RGB'
+    if image.mode != mode:
+        image = image.convert(mode)
+    created = []
+    for variant, size in pending.items():
+        created.append(save_variant(
+            storage,
+            variant_name(file.name, variant),
+            render_variant(image, size)
+        ))
+    return created
+
+
+def save_variant(storage, name, content):
+    if hasattr(storage, 'save_exact'):
+        return storage.save_exact(name, content)
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, content)
+
+
+def all_variants():
+    return {**settings.RECIPE_IMAGE_VARIANTS, **settings.AVATAR_IMAGE_VARIANTS}
+
+
+def variant_url(request, file, variant):
+    if not file:
+        return None
+    name = variant_name(file.name, variant)
+    if not file.storage.exists(name):
+        name = file.name
+    url = file.storage.url(name)
+    return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,60 @@
+import bisect
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+
+def normalize(name):
+    return name.strip().casefold()
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _build(self):
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (normalize(row['name']), row['id'])
+        )
+        keys = [normalize(row['name']) for row in rows]
+        version = hashlib.sha1(repr([
+            (row['id'], row['name'], row['measurement_unit']) for row in rows
+        ]).encode()).hexdigest()
+        return keys, rows, time.monotonic(), version
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and (
+            time.monotonic() - snapshot[2] < settings.INGREDIENT_INDEX_TTL
+        ):
+            return snapshot
+        with self._lock:
+            if self._snapshot is snapshot:
+                self._snapshot = self._build()
+            return self._snapshot
+
+    def search(self, prefix=None):
+        keys, rows, *_ = self._get_snapshot()
+        if not prefix:
+            return list(rows)
+        prefix = normalize(prefix)
+        start = bisect.bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return rows[start:end]
+
+    def version(self):
+        return self._get_snapshot()[3]
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+ingredient_index = IngredientIndex()
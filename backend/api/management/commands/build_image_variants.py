@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.images import generate_variants
+from recipes.models import Recipe
+from users.models import FoodgramUser
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии изображений рецептов и аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Пересоздать уже существующие копии'
+        )
+
+    def handle(self, *args, **kwargs):
+        created = 0
+        for recipe in Recipe.objects.exclude(image='').only('image'):
+            created += len(generate_variants(
+                recipe.image,
+                settings.RECIPE_IMAGE_VARIANTS,
+                kwargs['overwrite']
+            ))
+        for user in FoodgramUser.objects.exclude(
+            profile_image=''
+        ).only('profile_image'):
+            created += len(generate_variants(
+                user.profile_image,
+                settings.AVATAR_IMAGE_VARIANTS,
+                kwargs['overwrite']
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано изображений: {created}')
+        )
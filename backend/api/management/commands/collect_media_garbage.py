@@ -0,0 +1,77 @@
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.images import all_variants, variant_names
+from recipes.models import Recipe
+from users.models import FoodgramUser
+
+
+DEFAULT_MIN_AGE_HOURS = 24
+
+
+def walk(storage, path=''):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield f'{path}/{name}' if path else name
+    for directory in directories:
+        yield from walk(
+            storage, f'{path}/{directory}' if path else directory
+        )
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы медиа, на которые не ссылаются рецепты и аватары'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age-hours',
+            type=float,
+            default=DEFAULT_MIN_AGE_HOURS,
+            help='Не трогать файлы моложе указанного возраста'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены'
+        )
+
+    def handle(self, *args, **kwargs):
+        referenced = set(Recipe.objects.exclude(
+            image=''
+        ).values_list('image', flat=True))
+        referenced.update(FoodgramUser.objects.exclude(
+            profile_image=''
+        ).values_list('profile_image', flat=True))
+        variants = all_variants()
+        keep = set(referenced)
+        for name in referenced:
+            keep.update(variant_names(name, variants))
+
+        threshold = timezone.now() - timedelta(
+            hours=kwargs['min_age_hours']
+        )
+        names = list(walk(default_storage))
+        stale = {
+            name for name in names
+            if name not in keep
+            and default_storage.get_modified_time(name) <= threshold
+        }
+        for name in names:
+            if name not in stale:
+                stale.difference_update(variant_names(name, variants))
+        removed = 0
+        for name in names:
+            if name not in stale:
+                continue
+            if default_storage.get_modified_time(name) > threshold:
+                continue
+            removed += 1
+            if kwargs['dry_run']:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {removed}' if not kwargs['dry_run']
+            else f'Будет удалено файлов: {removed}'
+        ))
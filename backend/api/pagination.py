@@ -1,7 +1,15 @@
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import (
     PageNumberPagination,
     LimitOffsetPagination
 )
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPageNumberPagination(PageNumberPagination):
@@ -12,3 +20,85 @@ class LimitPageNumberPagination(PageNumberPagination):
 class RecipePagination(LimitOffsetPagination):
     default_limit = 10
     max_limit = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    keyset_ordering = ('-pub_date', '-id')
+    always_keyset = False
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            self.always_keyset
+            or self.cursor_query_param in request.query_params
+        ) and queryset.query.order_by in ((), self.keyset_ordering)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        queryset = queryset.order_by(*self.keyset_ordering)
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'exact':
+            self.count = self.get_count(queryset)
+
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            )
+        page = list(queryset[:self.limit + 1])
+        self.next_position = None
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            self.next_position = (page[-1].pub_date, page[-1].pk)
+        return page
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = b64decode(
+                cursor.encode(), altchars=b'-_', validate=True
+            ).decode().rsplit('|', 1)
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        pub_date, pk = position
+        return b64encode(
+            f'{pub_date.isoformat()}|{pk}'.encode(), altchars=b'-_'
+        ).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return None
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+
+class RecipeFeedPagination(RecipePagination):
+    always_keyset = True
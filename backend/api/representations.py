@@ -0,0 +1,50 @@
+from collections import defaultdict
+from operator import attrgetter
+
+from recipes.models import RecipeIngredient
+from .images import AVATAR_VARIANT, DETAIL_VARIANT, variant_url
+
+
+AUTHOR_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit', 'amount')
+INGREDIENT_COLUMNS = (
+    'ingredient_id',
+    'ingredient__name',
+    'ingredient__measurement_unit',
+    'amount',
+)
+
+get_author_values = attrgetter(*AUTHOR_FIELDS)
+
+
+def get_recipe_ingredients(recipe_ids):
+    ingredients = defaultdict(list)
+    for recipe_id, *values in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list('recipe_id', *INGREDIENT_COLUMNS):
+        ingredients[recipe_id].append(dict(zip(INGREDIENT_FIELDS, values)))
+    return ingredients
+
+
+def represent_recipes(recipes, request=None, image_variant=DETAIL_VARIANT):
+    ingredients = get_recipe_ingredients([recipe.pk for recipe in recipes])
+    representations = []
+    for recipe in recipes:
+        author = recipe.author
+        author_data = dict(zip(AUTHOR_FIELDS, get_author_values(author)))
+        author_data['is_subscribed'] = False
+        author_data['avatar'] = variant_url(
+            request, author.profile_image, AVATAR_VARIANT
+        )
+        representations.append({
+            'id': recipe.pk,
+            'author': author_data,
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': recipe.name,
+            'image': variant_url(request, recipe.image, image_variant),
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'ingredients': ingredients[recipe.pk],
+        })
+    return representations
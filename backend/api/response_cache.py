@@ -0,0 +1,90 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .conditional import conditional_response
+
+
+LIST_GENERATION_KEY = 'recipes:anonymous:generation'
+
+
+def recipe_version_key(recipe_id):
+    return f'recipes:anonymous:version:{recipe_id}'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(
+            key, version, settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+        ):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_recipe_versions(recipe_ids):
+    versions = {
+        recipe_version_key(recipe_id): uuid.uuid4().hex
+        for recipe_id in recipe_ids
+    }
+    versions[LIST_GENERATION_KEY] = uuid.uuid4().hex
+    cache.set_many(versions, settings.RECIPE_RESPONSE_CACHE_TIMEOUT)
+
+
+def request_fingerprint(request):
+    return hashlib.sha1(repr((
+        request.accepted_media_type,
+        request.build_absolute_uri(request.path),
+        sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+        ),
+    )).encode()).hexdigest()
+
+
+def anonymous_list_key(request):
+    if request.user.is_authenticated:
+        return None
+    return (
+        f'recipes:anonymous:list:{get_version(LIST_GENERATION_KEY)}:'
+        f'{request_fingerprint(request)}'
+    )
+
+
+def anonymous_detail_key(request, recipe_id):
+    if request.user.is_authenticated or not str(recipe_id).isdigit():
+        return None
+    version = get_version(recipe_version_key(recipe_id))
+    return (
+        f'recipes:anonymous:detail:{recipe_id}:{version}:'
+        f'{request_fingerprint(request)}'
+    )
+
+
+def cached_response(request, key, get_validators, get_data, max_age=0):
+    entry = cache.get(key) if key else None
+    if entry is not None:
+        etag, last_modified, data = entry
+        return conditional_response(
+            request, lambda: Response(data), etag, last_modified, max_age
+        )
+
+    etag, last_modified = get_validators()
+
+    def get_response():
+        data = get_data()
+        if key:
+            cache.set(
+                key,
+                (etag, last_modified, data),
+                settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+            )
+        return Response(data)
+
+    return conditional_response(
+        request, get_response, etag, last_modified, max_age
+    )
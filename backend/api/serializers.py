@@ -1,14 +1,51 @@
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from django.http import QueryDict
+from django.db import transaction
+from django.db.models.manager import BaseManager
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
 from users.models import FoodgramUser, Subscription
 from recipes.models import Recipe, Ingredient, RecipeIngredient
-from drf_extra_fields.fields import Base64ImageField
+from .conditional import recipe_version_parts
+from .images import (
+    AVATAR_VARIANT,
+    DETAIL_VARIANT,
+    LIST_VARIANT,
+    variant_url,
+)
+from .representations import represent_recipes
+from .uploads import (
+    DATA_URI_RE,
+    UPLOAD_EXTENSIONS,
+    decode_payload,
+    has_image_header,
+    image_extension,
+    prepare_source,
+    store_recipe_image,
+    submit,
+)
+from .downloads import bump_recipe_carts
 from django.core.validators import RegexValidator
 from django.contrib.auth import authenticate
 
 
 USERNAME_LENGTH = 150
 NAME_LENGTH = 150
+BULK_IDS_LIMIT = 100
+
+
+def parse_recipes_limit(value):
+    try:
+        return max(int(value), 0)
+    except (ValueError, TypeError):
+        return None
 
 
 class SetPasswordSerializer(serializers.Serializer):
@@ -39,8 +76,48 @@ class EmailAuthTokenSerializer(serializers.Serializer):
         return attrs
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_IDS_LIMIT,
+    )
+
+
+class ImagePayloadField(serializers.CharField):
+    default_error_messages = {
+        'invalid': 'Загрузите изображение в формате data:image/...;base64.',
+        'invalid_file': 'Загрузите файл изображения PNG, JPEG, GIF или WebP.',
+        'invalid_image': 'Некорректные данные изображения.',
+        'too_large': 'Изображение слишком большое.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            extension = os.path.splitext(data.name)[1].lower()
+            if extension not in UPLOAD_EXTENSIONS:
+                self.fail('invalid_file')
+            if data.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+                self.fail('too_large')
+            if not has_image_header(data):
+                self.fail('invalid_image')
+            return data
+        data = super().to_internal_value(data)
+        if not DATA_URI_RE.match(data):
+            self.fail('invalid')
+        if len(data) > settings.IMAGE_UPLOAD_MAX_SIZE * 4 // 3 + 64:
+            self.fail('too_large')
+        content = decode_payload(data)
+        if content is None:
+            self.fail('invalid_image')
+        content = ContentFile(content, name=f'image.{image_extension(data)}')
+        if not has_image_header(content):
+            self.fail('invalid_image')
+        return content
+
+
 class AvatarSerializer(serializers.Serializer):
-    avatar = Base64ImageField(required=True)
+    avatar = ImagePayloadField(required=True)
 
 
 class FoodgramUserCreateSerializer(UserCreateSerializer):
@@ -85,11 +162,17 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     name = serializers.CharField()
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, obj):
+        return variant_url(
+            self.context.get('request'), obj.image, LIST_VARIANT
+        )
+
 
 class FoodgramUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
@@ -112,25 +195,9 @@ class FoodgramUserSerializer(serializers.ModelSerializer):
         return False
 
     def get_avatar(self, obj):
-        if obj.profile_image:
-            request = self.context.get('request')
-            return request.build_absolute_uri(
-                obj.profile_image.url
-            ) if request else obj.profile_image.url
-        return None
-
-
-class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(source='ingredient.id')
-    name = serializers.ReadOnlyField(source='ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit'
-    )
-    amount = serializers.IntegerField(read_only=True)
-
-    class Meta:
-        model = RecipeIngredient
-        fields = ('id', 'name', 'measurement_unit', 'amount')
+        return variant_url(
+            self.context.get('request'), obj.profile_image, AVATAR_VARIANT
+        )
 
 
 class AuthorSerializer(serializers.ModelSerializer):
@@ -147,18 +214,17 @@ class AuthorSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            if hasattr(obj, 'is_subscribed'):
+                return obj.is_subscribed
             return Subscription.objects.filter(
                 author=obj, subscriber=request.user
             ).exists()
         return False
 
     def get_avatar(self, obj):
-        request = self.context.get('request')
-        if obj.profile_image:
-            return request.build_absolute_uri(
-                obj.profile_image.url
-            ) if request else obj.profile_image.url
-        return None
+        return variant_url(
+            self.context.get('request'), obj.profile_image, AVATAR_VARIANT
+        )
 
 
 class IngredientAmountWriteSerializer(serializers.Serializer):
@@ -173,13 +239,16 @@ class IngredientAmountWriteSerializer(serializers.Serializer):
         return value
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, BaseManager) else data
+        return self.child.represent(list(recipes))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
-    recipe_ingredients = IngredientInRecipeSerializer(
-        many=True, read_only=True, source="components"
-    )
     ingredients = IngredientAmountWriteSerializer(many=True, write_only=True)
-    image = Base64ImageField(required=True)
+    image = ImagePayloadField(required=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     name = serializers.CharField(max_length=256)
@@ -188,13 +257,14 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            "id", "author", "recipe_ingredients", "ingredients",
+            "id", "author", "ingredients",
             "is_favorited", "is_in_shopping_cart", "name",
             "image", "text", "cooking_time",
         )
         read_only_fields = (
             "id", "author", "is_favorited", "is_in_shopping_cart",
         )
+        list_serializer_class = RecipeListSerializer
 
     def validate_image(self, value):
         if not value:
@@ -232,55 +302,153 @@ class RecipeSerializer(serializers.ModelSerializer):
                 )
         return attrs
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = data.dict()
+            if isinstance(data.get("ingredients"), str):
+                try:
+                    data["ingredients"] = json.loads(data["ingredients"])
+                except ValueError:
+                    raise serializers.ValidationError({"ingredients": [
+                        "Ожидается JSON-список ингредиентов."
+                    ]})
+        return super().to_internal_value(data)
+
     def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        representation["ingredients"] = IngredientInRecipeSerializer(
-            instance.components.all(), many=True, context=self.context
-        ).data
-        if "recipe_ingredients" in representation:
-            representation.pop("recipe_ingredients")
+        return self.represent([instance])[0]
+
+    def represent(self, recipes):
+        request = self.context.get("request")
+        keys = {
+            recipe.pk: self.get_fragment_key(request, recipe)
+            for recipe in recipes
+        }
+        fragments = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if missing:
+            built = {
+                keys[recipe.pk]: fragment for recipe, fragment in zip(
+                    missing, represent_recipes(
+                        missing, request, self.get_image_variant()
+                    )
+                )
+            }
+            cache.set_many(built, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+            fragments.update(built)
+        return [
+            self.add_user_flags(fragments[keys[recipe.pk]], recipe)
+            for recipe in recipes
+        ]
+
+    def get_image_variant(self):
+        return self.context.get('image_variant', DETAIL_VARIANT)
+
+    def get_fragment_key(self, request, recipe):
+        return 'recipes:fragment:' + hashlib.sha1(repr((
+            request.build_absolute_uri('/') if request else None,
+            self.get_image_variant(),
+            recipe_version_parts(recipe),
+        )).encode()).hexdigest()
+
+    def add_user_flags(self, fragment, instance):
+        if hasattr(instance, "author_is_subscribed"):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        representation = fragment.copy()
+        representation["author"] = fragment["author"].copy()
+        representation["author"]["is_subscribed"] = (
+            self.fields["author"].get_is_subscribed(instance.author)
+        )
+        representation["is_favorited"] = self.get_is_favorited(instance)
+        representation["is_in_shopping_cart"] = (
+            self.get_is_in_shopping_cart(instance)
+        )
         return representation
 
     def get_is_favorited(self, obj):
         request = self.context.get("request")
         if not request or request.user.is_anonymous:
             return False
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         return obj.favorites.filter(user=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get("request")
         if not request or request.user.is_anonymous:
             return False
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         return obj.shopping_cart_items.filter(user=request.user).exists()
 
     def _manage_ingredients(self, recipe, ingredients_data_list):
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
+        amounts = {
+            item_data["id"].id: item_data["amount"]
+            for item_data in ingredients_data_list
+        }
+        existing = {
+            component.ingredient_id: component
+            for component in RecipeIngredient.objects.filter(recipe=recipe)
+        }
         ings_to_create = [
             RecipeIngredient(
-                recipe=recipe, ingredient=item_data["id"],
-                amount=item_data["amount"],
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
             )
-            for item_data in ingredients_data_list
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        ings_to_update = []
+        for ingredient_id, component in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and component.amount != amount:
+                component.amount = amount
+                ings_to_update.append(component)
+        ids_to_delete = [
+            component.id for ingredient_id, component in existing.items()
+            if ingredient_id not in amounts
         ]
-        RecipeIngredient.objects.bulk_create(ings_to_create)
+        if not (ings_to_create or ings_to_update or ids_to_delete):
+            return
+        with transaction.atomic():
+            if ids_to_delete:
+                RecipeIngredient.objects.filter(
+                    id__in=ids_to_delete
+                )._raw_delete(RecipeIngredient.objects.db)
+            RecipeIngredient.objects.bulk_update(ings_to_update, ["amount"])
+            RecipeIngredient.objects.bulk_create(ings_to_create)
+        if existing:
+            transaction.on_commit(lambda: bump_recipe_carts([recipe.id]))
 
     def create(self, validated_data):
         ingredients_list = validated_data.pop("ingredients")
+        image = validated_data.pop("image")
         recipe = Recipe.objects.create(**validated_data)
         self._manage_ingredients(recipe, ingredients_list)
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        submit(store_recipe_image, recipe.pk, prepare_source(image))
         return recipe
 
     def update(self, instance, validated_data):
-        ingredients_list = validated_data.pop("ingredients", [])
+        ingredients_list = validated_data.pop("ingredients", None)
         instance.name = validated_data.get("name", instance.name)
         instance.text = validated_data.get("text", instance.text)
         instance.cooking_time = validated_data.get(
             "cooking_time", instance.cooking_time
         )
-        instance.image = validated_data.get("image", instance.image)
-        instance.save()
-
-        self._manage_ingredients(instance, ingredients_list)
+        with transaction.atomic():
+            instance.save(update_fields=[
+                "name", "text", "cooking_time", "updated_at"
+            ])
+            if ingredients_list is not None:
+                self._manage_ingredients(instance, ingredients_list)
+            Recipe.objects.filter(pk=instance.pk).update_search_vector()
+        if validated_data.get("image"):
+            submit(
+                store_recipe_image,
+                instance.pk,
+                prepare_source(validated_data["image"])
+            )
 
         return instance
 
@@ -311,7 +479,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     last_name = serializers.ReadOnlyField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
     avatar = serializers.SerializerMethodField()
 
     class Meta:
@@ -326,32 +494,26 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
-        return Subscription.objects.filter(
-            subscriber=request.user,
-            author=obj.author
-        ).exists()
+        return obj.subscriber_id == request.user.id
 
     def get_recipes(self, obj):
-        author = obj.author
-        qs = Recipe.objects.filter(author=author)
-        limit = self.context.get('request').query_params.get('recipes_limit')
-        if limit is not None:
-            try:
-                limit = int(limit)
-                qs = qs[:limit]
-            except (ValueError, TypeError):
-                pass
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            recipes = recipes_by_author.get(obj.author_id, [])
+        else:
+            recipes = Recipe.objects.filter(author=obj.author)
+            limit = parse_recipes_limit(
+                self.context.get('request').query_params.get('recipes_limit')
+            )
+            if limit is not None:
+                recipes = recipes[:limit]
         return RecipeMinifiedSerializer(
-            qs, many=True, context=self.context
+            recipes, many=True, context=self.context
         ).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
-
     def get_avatar(self, obj):
-        author = obj.author
-        if not author.profile_image:
-            return None
-        request = self.context.get('request')
-        url = author.profile_image.url
-        return request.build_absolute_uri(url) if request else url
+        return variant_url(
+            self.context.get('request'),
+            obj.author.profile_image,
+            AVATAR_VARIANT,
+        )
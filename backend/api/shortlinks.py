@@ -0,0 +1,56 @@
+import hashlib
+import string
+from functools import lru_cache
+from django.conf import settings
+from .models import ShortLink
+
+
+ALPHABET = string.digits + string.ascii_letters
+CODE_LENGTH = 7
+ID_BITS = 41
+ID_MASK = (1 << ID_BITS) - 1
+LEGACY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=None)
+def get_salt_keys(salt):
+    digest = hashlib.sha256(salt.encode()).digest()
+    multiplier = int.from_bytes(digest[:8], 'big') & ID_MASK | 1
+    mask = int.from_bytes(digest[8:16], 'big') & ID_MASK
+    return multiplier, pow(multiplier, -1, 1 << ID_BITS), mask
+
+
+def encode_recipe_id(recipe_id):
+    multiplier, _, mask = get_salt_keys(settings.SHORTLINK_SALT)
+    number = (recipe_id * multiplier & ID_MASK) ^ mask
+    chars = []
+    for _ in range(CODE_LENGTH):
+        number, index = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def decode_recipe_id(key):
+    number = 0
+    for char in key:
+        index = ALPHABET.find(char)
+        if index < 0:
+            return None
+        number = number * len(ALPHABET) + index
+    if number > ID_MASK:
+        return None
+    _, inverse, mask = get_salt_keys(settings.SHORTLINK_SALT)
+    return (number ^ mask) * inverse & ID_MASK or None
+
+
+@lru_cache(maxsize=LEGACY_CACHE_SIZE)
+def resolve_legacy_key(key):
+    return ShortLink.objects.filter(key=key).values_list(
+        'recipe_id', flat=True
+    ).first()
+
+
+def resolve_short_link(key):
+    if len(key) == CODE_LENGTH:
+        return decode_recipe_id(key)
+    return resolve_legacy_key(key)
@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from users.models import FoodgramUser, relations_changed
+from .authentication import invalidate_token, invalidate_user_tokens
+from .downloads import bump_cart_versions, bump_recipe_carts
+from .images import generate_variants, variant_names
+from .ingredient_index import ingredient_index
+from .response_cache import bump_recipe_versions
+from .uploads import submit
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_carts(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: bump_ingredient_recipes(instance))
+
+
+def bump_ingredient_recipes(ingredient):
+    bump_cart_versions(set(ShoppingCart.objects.filter(
+        recipe__components__ingredient=ingredient
+    ).values_list('user_id', flat=True)))
+    bump_recipe_versions(Recipe.objects.filter(
+        ingredients=ingredient
+    ).values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def invalidate_user_cart(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_cart_versions([user_id]))
+
+
+@receiver(relations_changed, sender=ShoppingCart)
+def invalidate_changed_cart(sender, owner_id, **kwargs):
+    transaction.on_commit(lambda: bump_cart_versions([owner_id]))
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_carts(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: bump_recipe_carts([recipe_id]))
+    transaction.on_commit(lambda: bump_recipe_versions([recipe_id]))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_cached_recipe(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: bump_recipe_versions([recipe_id]))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver([post_save, post_delete], sender=FoodgramUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=FoodgramUser)
+def invalidate_author_recipes(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: bump_recipe_versions(
+            Recipe.objects.filter(author=instance).values_list(
+                'id', flat=True
+            )
+        ))
+
+
+def needs_variants(file, variants, update_fields):
+    if not file or (
+        update_fields is not None and file.field.name not in update_fields
+    ):
+        return False
+    storage = file.storage
+    return storage.exists(file.name) and not all(
+        storage.exists(name) for name in variant_names(file.name, variants)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def build_recipe_image_variants(sender, instance, update_fields, **kwargs):
+    if needs_variants(
+        instance.image, settings.RECIPE_IMAGE_VARIANTS, update_fields
+    ):
+        submit(
+            generate_variants, instance.image, settings.RECIPE_IMAGE_VARIANTS
+        )
+
+
+@receiver(post_save, sender=FoodgramUser)
+def build_avatar_variants(sender, instance, update_fields, **kwargs):
+    if needs_variants(
+        instance.profile_image, settings.AVATAR_IMAGE_VARIANTS, update_fields
+    ):
+        submit(
+            generate_variants,
+            instance.profile_image,
+            settings.AVATAR_IMAGE_VARIANTS
+        )
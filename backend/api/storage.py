@@ -0,0 +1,32 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+CONTENT_DIRECTORY = 'content'
+
+
+def content_name(digest, name):
+    extension = os.path.splitext(name)[1].lower()
+    return f'{CONTENT_DIRECTORY}/{digest[:2]}/{digest}{extension}'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        return content_name(digest.hexdigest(), name)
+
+    def _save(self, name, content):
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+    def save_exact(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        return super()._save(name, content)
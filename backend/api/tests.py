@@ -0,0 +1,147 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from users.models import FoodgramUser, Subscription
+from .images import DETAIL_VARIANT, variant_url
+from .serializers import AuthorSerializer, RecipeSerializer
+
+
+class IngredientInRecipeSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class NestedRecipeSerializer(serializers.ModelSerializer):
+    author = AuthorSerializer(read_only=True)
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id', 'author', 'is_favorited', 'is_in_shopping_cart',
+            'name', 'image', 'text', 'cooking_time',
+        )
+
+    get_is_favorited = RecipeSerializer.get_is_favorited
+    get_is_in_shopping_cart = RecipeSerializer.get_is_in_shopping_cart
+
+    def get_image(self, obj):
+        return variant_url(
+            self.context.get('request'),
+            obj.image,
+            self.context.get('image_variant', DETAIL_VARIANT),
+        )
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        representation = super().to_representation(instance)
+        representation['ingredients'] = IngredientInRecipeSerializer(
+            instance.components.select_related('ingredient').order_by('id'),
+            many=True,
+        ).data
+        return representation
+
+
+def represent_nested(serializer, recipes):
+    return NestedRecipeSerializer(
+        recipes, many=True, context=serializer.context
+    ).data
+
+
+class RecipeRepresentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = FoodgramUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Иван', last_name='Петров', password='password123',
+            profile_image='users/avatars/author.png',
+        )
+        cls.other = FoodgramUser.objects.create_user(
+            username='other', email='other@example.com',
+            first_name='Анна', last_name='Смирнова', password='password123',
+        )
+        cls.viewer = FoodgramUser.objects.create_user(
+            username='viewer', email='viewer@example.com',
+            first_name='Олег', last_name='Сидоров', password='password123',
+        )
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('мука', 'г'), ('молоко', 'мл'), ('яйца', 'шт'), ('соль', 'г')
+            )
+        ]
+        cls.recipes = []
+        for index in range(5):
+            recipe = Recipe.objects.create(
+                author=cls.author if index % 2 else cls.other,
+                name=f'Рецепт {index}',
+                text=f'Описание рецепта {index}',
+                cooking_time=10 + index,
+                image=f'recipes/recipe{index}.png',
+            )
+            for offset in range(index % 3 + 1):
+                RecipeIngredient.objects.create(
+                    recipe=recipe,
+                    ingredient=ingredients[(index + offset) % 4],
+                    amount=(index + 1) * (offset + 1),
+                )
+            cls.recipes.append(recipe)
+        Subscription.objects.create(subscriber=cls.viewer, author=cls.author)
+        Favorite.objects.create(user=cls.viewer, recipe=cls.recipes[1])
+        ShoppingCart.objects.create(user=cls.viewer, recipe=cls.recipes[2])
+
+    def get_content(self, client, url):
+        cache.clear()
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def assert_same_bytes(self, url):
+        anonymous = APIClient()
+        authenticated = APIClient()
+        authenticated.force_authenticate(self.viewer)
+        for client in (anonymous, authenticated):
+            with self.subTest(url=url, user=client is authenticated):
+                with mock.patch.object(
+                    RecipeSerializer, 'represent', represent_nested
+                ):
+                    expected = self.get_content(client, url)
+                self.assertEqual(self.get_content(client, url), expected)
+
+    def test_list(self):
+        self.assert_same_bytes('/api/recipes/')
+
+    def test_paginated_list(self):
+        self.assert_same_bytes('/api/recipes/?limit=2&offset=2')
+
+    def test_cursor_list(self):
+        self.assert_same_bytes('/api/recipes/?cursor=&limit=2')
+
+    def test_filtered_list(self):
+        self.assert_same_bytes(f'/api/recipes/?author={self.author.pk}')
+
+    def test_detail(self):
+        for recipe in self.recipes[:3]:
+            self.assert_same_bytes(f'/api/recipes/{recipe.pk}/')
@@ -0,0 +1,149 @@
+import base64
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.uploadedfile import UploadedFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.models import Recipe
+from users.models import FoodgramUser
+from .images import generate_variants
+from .response_cache import bump_recipe_versions
+
+
+logger = logging.getLogger(__name__)
+
+DATA_URI_RE = re.compile(
+    r'^data:image/(?P<extension>png|jpe?g|gif|webp);base64,'
+)
+UPLOAD_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images'
+)
+slots = threading.BoundedSemaphore(settings.IMAGE_QUEUE_SIZE)
+
+
+def image_extension(payload):
+    extension = DATA_URI_RE.match(payload).group('extension')
+    return 'jpg' if extension == 'jpeg' else extension
+
+
+def decode_payload(payload):
+    try:
+        return base64.b64decode(
+            payload[payload.index(',') + 1:], validate=True
+        )
+    except ValueError:
+        return None
+
+
+def is_valid_image(file):
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            image.verify()
+    except (OSError, Image.DecompressionBombError):
+        return False
+    finally:
+        file.seek(0)
+    return True
+
+
+def has_image_header(file):
+    try:
+        file.seek(0)
+        with Image.open(file):
+            pass
+    except (OSError, Image.DecompressionBombError):
+        return False
+    finally:
+        file.seek(0)
+    return True
+
+
+def stash_upload(upload):
+    stash = tempfile.NamedTemporaryFile(
+        suffix=os.path.splitext(upload.name)[1].lower(),
+        dir=settings.FILE_UPLOAD_TEMP_DIR,
+    )
+    for chunk in upload.chunks():
+        stash.write(chunk)
+    stash.seek(0)
+    return File(stash, name=upload.name)
+
+
+def prepare_source(value):
+    if isinstance(value, UploadedFile):
+        return stash_upload(value)
+    return value
+
+
+def run(task, args, release=True):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception('Ошибка обработки изображения')
+    finally:
+        if release:
+            close_old_connections()
+            slots.release()
+
+
+def submit(task, *args):
+    def enqueue():
+        if slots.acquire(timeout=settings.IMAGE_QUEUE_TIMEOUT):
+            executor.submit(run, task, args)
+        else:
+            logger.warning('Очередь обработки изображений переполнена')
+            run(task, args, release=False)
+
+    transaction.on_commit(enqueue)
+
+
+def store_recipe_image(recipe_id, content):
+    with content:
+        if not is_valid_image(content):
+            logger.warning('Некорректное изображение рецепта %s', recipe_id)
+            return
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is None:
+            return
+        recipe.image.save(content.name, content, save=False)
+    generate_variants(recipe.image, settings.RECIPE_IMAGE_VARIANTS)
+    recipe.save(update_fields=['image', 'updated_at'])
+
+
+def avatar_name(user, content):
+    storage = user.profile_image.storage
+    name = user.profile_image.field.generate_filename(user, content.name)
+    if hasattr(storage, 'get_content_name'):
+        return storage.get_content_name(name, content)
+    return storage.get_available_name(name)
+
+
+def store_avatar(user_id, name, old_name, content):
+    with content:
+        user = FoodgramUser.objects.filter(
+            pk=user_id, profile_image=name
+        ).first()
+        if user is None:
+            return
+        if not is_valid_image(content):
+            logger.warning('Некорректный аватар пользователя %s', user_id)
+            user.profile_image = old_name
+            user.save(update_fields=['profile_image'])
+            return
+        user.profile_image.storage.save(name, content)
+    generate_variants(user.profile_image, settings.AVATAR_IMAGE_VARIANTS)
+    recipes = Recipe.objects.filter(author_id=user_id)
+    recipes.update(updated_at=timezone.now())
+    bump_recipe_versions(recipes.values_list('id', flat=True))
@@ -1,19 +1,37 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponse
+from django.urls import reverse
 from rest_framework import viewsets, filters, status, permissions
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from django_filters.rest_framework import DjangoFilterBackend
+from .authentication import CachedTokenAuthentication, invalidate_user_tokens
+from .conditional import (
+    conditional_response,
+    make_etag,
+    recipe_etag_parts,
+)
 from .filters import RecipeFilter, IngredientFilter
-import io
-from reportlab.pdfgen import canvas
-from django.db import models
+from collections import defaultdict
 from users.models import Subscription, FoodgramUser
-from recipes.models import Recipe, Ingredient, ShoppingCart, Favorite
-from .models import ShortLink
+from recipes.models import (
+    SEARCH_CONFIG, Recipe, Ingredient, ShoppingCart, Favorite
+)
+from .downloads import shopping_list_response
+from .shortlinks import encode_recipe_id, resolve_short_link
+from .images import AVATAR_VARIANT, LIST_VARIANT, variant_url
+from .ingredient_index import ingredient_index
+from .response_cache import (
+    anonymous_detail_key,
+    anonymous_list_key,
+    cached_response,
+)
+from .uploads import avatar_name, prepare_source, store_avatar, submit
 from .serializers import (
     FoodgramUserCreateSerializer,
     FoodgramUserSerializer,
@@ -22,15 +40,52 @@ from .serializers import (
     SubscriptionSerializer,
     IngredientSerializer,
     AvatarSerializer,
+    BulkIdsSerializer,
     SetPasswordSerializer,
     EmailAuthTokenSerializer,
+    parse_recipes_limit,
+)
+from .pagination import (
+    LimitPageNumberPagination,
+    RecipeFeedPagination,
+    RecipePagination,
 )
-from .pagination import LimitPageNumberPagination, RecipePagination
+
+
+LIST_ACTIONS = ('list', 'feed', 'search')
+
+
+def bulk_relation_response(request, model, target_model, excluded=()):
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    found = set(target_model.objects.filter(
+        pk__in=ids
+    ).values_list('pk', flat=True))
+    valid = [pk for pk in ids if pk in found and pk not in excluded]
+    if request.method == 'POST':
+        changed = set(model.objects.add(request.user, valid))
+        statuses = ('created', 'exists')
+    else:
+        changed = set(model.objects.remove(request.user, valid))
+        statuses = ('deleted', 'not_found')
+    results = []
+    for pk in ids:
+        if pk not in found:
+            item_status = 'not_found'
+        elif pk in excluded:
+            item_status = 'self'
+        else:
+            item_status = statuses[0] if pk in changed else statuses[1]
+        results.append({'id': pk, 'status': item_status})
+    return Response(results, status=status.HTTP_200_OK)
 
 
 def redirect_short_link(request, short_link):
-    link = get_object_or_404(ShortLink, key=short_link)
-    return redirect(f'/api/recipes/{link.recipe.id}/')
+    recipe_id = resolve_short_link(short_link)
+    if recipe_id is None:
+        raise Http404
+    return redirect(f'/api/recipes/{recipe_id}/')
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -42,6 +97,25 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        return conditional_response(
+            request,
+            lambda: Response(ingredient_index.search(name)),
+            make_etag(request, ingredient_index.version(), name),
+            max_age=settings.INGREDIENT_CACHE_MAX_AGE,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            lambda: super(IngredientViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+            make_etag(request, ingredient_index.version(), kwargs['pk']),
+            max_age=settings.INGREDIENT_CACHE_MAX_AGE,
+        )
+
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -59,16 +133,17 @@ class LoginView(APIView):
 
 
 class LogoutView(APIView):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
+        invalidate_user_tokens(request.user.pk)
         Token.objects.filter(user=request.user).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class UserViewSet(viewsets.ModelViewSet):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     queryset = FoodgramUser.objects.all()
     pagination_class = LimitPageNumberPagination
     filter_backends = [filters.SearchFilter]
@@ -85,7 +160,8 @@ class UserViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return [permissions.AllowAny()]
         if self.action in [
-            'me', 'set_password', 'subscribe', 'subscriptions', 'avatar'
+            'me', 'set_password', 'subscribe', 'subscribe_bulk',
+            'subscriptions', 'avatar'
         ]:
             return [permissions.IsAuthenticated()]
         return [permissions.IsAuthenticatedOrReadOnly()]
@@ -116,7 +192,8 @@ class UserViewSet(viewsets.ModelViewSet):
                 ]}, status=status.HTTP_400_BAD_REQUEST
             )
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
+        invalidate_user_tokens(user.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -134,16 +211,14 @@ class UserViewSet(viewsets.ModelViewSet):
             )
 
         if request.method == 'POST':
-            sub, created = Subscription.objects.get_or_create(
-                subscriber=request.user, author=author
-            )
-            if not created:
+            if not Subscription.objects.add(request.user, [author.id]):
                 return Response(
                     {"detail": "Вы уже подписаны на этого автора."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             serializer = SubscriptionSerializer(
-                sub, context={
+                Subscription(subscriber=request.user, author=author),
+                context={
                     'request':
                         request, 'recipes_limit': request.query_params.get(
                                  'recipes_limit'
@@ -152,26 +227,43 @@ class UserViewSet(viewsets.ModelViewSet):
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        qs = Subscription.objects.filter(
-            subscriber=request.user, author=author
-        )
-        if not qs.exists():
+        if not Subscription.objects.remove(request.user, [author.id]):
             return Response(
                 {"detail": "Подписка не найдена."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        qs.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[permissions.IsAuthenticated],
+        url_path='subscribe/bulk'
+    )
+    def subscribe_bulk(self, request):
+        return bulk_relation_response(
+            request, Subscription, FoodgramUser, excluded={request.user.pk}
+        )
+
     @action(detail=False, methods=['get'], url_path='subscriptions',
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        qs = Subscription.objects.filter(subscriber=request.user)
+        qs = Subscription.objects.filter(
+            subscriber=request.user
+        ).select_related('author').order_by('id')
         paginated = self.paginate_queryset(qs)
+        recipes_by_author = defaultdict(list)
+        for recipe in Recipe.objects.limited_per_author(
+            [sub.author_id for sub in paginated],
+            parse_recipes_limit(request.query_params.get('recipes_limit'))
+        ):
+            recipes_by_author[recipe.author_id].append(recipe)
         serializer = SubscriptionSerializer(
             paginated,
             many=True,
-            context={'request': request}
+            context={
+                'request': request, 'recipes_by_author': recipes_by_author
+            }
         )
         return self.get_paginated_response(serializer.data)
 
@@ -180,33 +272,107 @@ class UserViewSet(viewsets.ModelViewSet):
     ], url_path='me/avatar')
     def avatar(self, request):
         user = request.user
+        old_name = user.profile_image.name
         if request.method == 'PUT':
             serializer = AvatarSerializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            if user.profile_image:
-                user.profile_image.delete(save=False)
-            user.profile_image = serializer.validated_data['avatar']
-            user.save()
-            avatar_url = request.build_absolute_uri(user.profile_image.url)
+            content = serializer.validated_data['avatar']
+            user.profile_image = avatar_name(user, content)
+            user.save(update_fields=['profile_image'])
+            submit(
+                store_avatar,
+                user.pk,
+                user.profile_image.name,
+                old_name,
+                prepare_source(content)
+            )
+            avatar_url = variant_url(
+                request, user.profile_image, AVATAR_VARIANT
+            )
             return Response({'avatar': avatar_url}, status=status.HTTP_200_OK)
         if user.profile_image:
-            user.profile_image.delete(save=True)
+            user.profile_image = ''
+            user.save(update_fields=['profile_image'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = RecipePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     search_fields = ['name', 'author__username']
 
+    def get_queryset(self):
+        return Recipe.objects.for_display(self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in LIST_ACTIONS:
+            context['image_variant'] = LIST_VARIANT
+        return context
+
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(
+            request, force=force or self.action == 'download_shopping_cart'
+        )
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def paginated_response(self, queryset):
+        page = None
+
+        def get_validators():
+            nonlocal page
+            page = self.paginate_queryset(queryset)
+            paginator = self.paginator
+            return make_etag(
+                self.request,
+                self.request.get_full_path(),
+                getattr(paginator, 'count', None),
+                paginator.get_next_link(),
+                paginator.get_previous_link(),
+                [recipe_etag_parts(recipe) for recipe in page],
+            ), None
+
+        return cached_response(
+            self.request,
+            anonymous_list_key(self.request),
+            get_validators,
+            lambda: self.get_paginated_response(
+                self.get_serializer(page, many=True).data
+            ).data,
+            settings.RECIPE_CACHE_MAX_AGE,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_response(
+            self.filter_queryset(self.get_queryset())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = None
+
+        def get_validators():
+            nonlocal instance
+            instance = self.get_object()
+            return make_etag(request, recipe_etag_parts(instance)), (
+                None if request.user.is_authenticated
+                else instance.updated_at
+            )
+
+        return cached_response(
+            request,
+            anonymous_detail_key(request, kwargs['pk']),
+            get_validators,
+            lambda: self.get_serializer(instance).data,
+            settings.RECIPE_CACHE_MAX_AGE,
+        )
+
     def create(self, request, *args, **kwargs):
         if "image" not in request.data:
             return Response(
@@ -233,17 +399,45 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return super().destroy(request, *args, **kwargs)
 
+    @action(detail=False, methods=['get'], permission_classes=[
+        permissions.IsAuthenticated
+    ], url_path='feed', pagination_class=RecipeFeedPagination)
+    def feed(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author_id__in=Subscription.objects.filter(
+                subscriber=request.user
+            ).values('author_id')
+        )
+        return self.paginated_response(queryset)
+
+    @action(detail=False, methods=['get'], permission_classes=[
+        permissions.AllowAny
+    ], url_path='search')
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {"q": ["Это поле обязательно."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            search_vector=search_query
+        ).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date', '-id')
+        return self.paginated_response(queryset)
+
     @action(detail=True, methods=['get'], permission_classes=[
         permissions.AllowAny
     ], url_path='get-link')
     def get_link(self, request, pk=None):
         recipe = self.get_object()
-        short_link, created = ShortLink.objects.get_or_create(
-            recipe=recipe
-        )
-        absolute_url = request.build_absolute_uri(
-            short_link.get_absolute_url()
-        )
+        absolute_url = request.build_absolute_uri(reverse(
+            'redirect_short_link', args=[encode_recipe_id(recipe.id)]
+        ))
         return Response({
             'short-link': absolute_url
         }, status=status.HTTP_200_OK)
@@ -253,25 +447,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
     ], url_path='favorite')
     def favorite(self, request, pk=None):
         recipe = self.get_object()
-        fav_qs = Favorite.objects.filter(user=request.user, recipe=recipe)
 
         if request.method == 'POST':
-            if fav_qs.exists():
+            if not Favorite.objects.add(request.user, [recipe.id]):
                 return Response({
                     'detail': 'Уже в избранном'
                 }, status=status.HTTP_400_BAD_REQUEST)
-            Favorite.objects.create(user=request.user, recipe=recipe)
             return Response(
                 RecipeMinifiedSerializer(
                     recipe
                 ).data, status=status.HTTP_201_CREATED
             )
 
-        if not fav_qs.exists():
+        if not Favorite.objects.remove(request.user, [recipe.id]):
             return Response({
                 'detail': 'Не в избранном'
             }, status=status.HTTP_400_BAD_REQUEST)
-        fav_qs.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post', 'delete'],
@@ -279,63 +470,41 @@ class RecipeViewSet(viewsets.ModelViewSet):
             url_path='shopping_cart')
     def shopping_cart(self, request, pk=None):
         recipe = self.get_object()
-        cart_qs = ShoppingCart.objects.filter(user=request.user, recipe=recipe)
 
         if request.method == 'POST':
-            if cart_qs.exists():
+            if not ShoppingCart.objects.add(request.user, [recipe.id]):
                 return Response(
                     {"detail": "Рецепт уже в корзине."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            ShoppingCart.objects.create(user=request.user, recipe=recipe)
             data = RecipeMinifiedSerializer(
                 recipe, context={'request': request}
             ).data
             return Response(data, status=status.HTTP_201_CREATED)
 
-        if not cart_qs.exists():
+        if not ShoppingCart.objects.remove(request.user, [recipe.id]):
             return Response(
                 {"detail": "Рецепта нет в корзине."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        cart_qs.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['post', 'delete'], permission_classes=[
+        permissions.IsAuthenticated
+    ], url_path='favorite/bulk')
+    def favorite_bulk(self, request):
+        return bulk_relation_response(request, Favorite, Recipe)
+
+    @action(detail=False, methods=['post', 'delete'], permission_classes=[
+        permissions.IsAuthenticated
+    ], url_path='shopping_cart/bulk')
+    def shopping_cart_bulk(self, request):
+        return bulk_relation_response(request, ShoppingCart, Recipe)
+
     @action(detail=False, methods=['get'], permission_classes=[
         permissions.IsAuthenticated
     ], url_path='download_shopping_cart')
     def download_shopping_cart(self, request):
-        ingredients = Ingredient.objects.filter(
-            used_in__recipe__shopping_cart_items__user=request.user
-        ).values(
-            'name', 'measurement_unit'
-        ).annotate(total=models.Sum('used_in__amount'))
-
-        lines = [
-            f"{i['name']} ({i['measurement_unit']}) — {i['total']}"
-            for i in ingredients
-        ]
-        fmt = request.query_params.get('format', 'txt')
-
-        if fmt == 'pdf':
-            buffer = io.BytesIO()
-            p = canvas.Canvas(buffer)
-            y = 800
-            for line in lines:
-                p.drawString(50, y, line)
-                y -= 15
-            p.showPage()
-            p.save()
-            buffer.seek(0)
-            response = HttpResponse(buffer, content_type='application/pdf')
-            response[
-                'Content-Disposition'
-            ] = 'attachment; filename="shopping_list.pdf"'
-            return response
-
-        content = "\n".join(lines)
-        response = HttpResponse(content, content_type='text/plain')
-        response[
-            'Content-Disposition'
-        ] = 'attachment; filename="shopping_list.txt"'
-        return response
+        return shopping_list_response(
+            request.user, request.query_params.get('format', 'txt')
+        )
@@ -29,6 +29,12 @@ STATIC_ROOT = os.getenv("STATIC_ROOT", BASE_DIR / "static")
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.getenv("MEDIA_ROOT", BASE_DIR / "media")
+STORAGES = {
+    "default": {"BACKEND": "api.storage.ContentAddressedStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -64,6 +70,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "django_extensions",
     "rest_framework",
     "rest_framework.authtoken",
@@ -79,7 +86,7 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -104,10 +111,51 @@ DJOSER = {
     'HIDE_USERS': False
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+TOKEN_AUTH_CACHE_ALIAS = os.getenv("TOKEN_AUTH_CACHE_ALIAS") or None
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.getenv("TOKEN_AUTH_CACHE_TIMEOUT", 60))
+TOKEN_AUTH_CACHE_SIZE = int(os.getenv("TOKEN_AUTH_CACHE_SIZE", 10000))
+
 SHOPPING_CART_FONT_PATH = os.getenv(
     "FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
 )
+SHOPPING_CART_CACHE_TIMEOUT = int(
+    os.getenv("SHOPPING_CART_CACHE_TIMEOUT", 60 * 60)
+)
+SHOPPING_CART_CACHE_MAX_BYTES = int(
+    os.getenv("SHOPPING_CART_CACHE_MAX_BYTES", 512 * 1024)
+)
 SHORTLINK_SALT = os.getenv("SHORTLINK_SALT", "default-salt")
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", 300))
+INGREDIENT_CACHE_MAX_AGE = int(os.getenv("INGREDIENT_CACHE_MAX_AGE", 300))
+RECIPE_CACHE_MAX_AGE = int(os.getenv("RECIPE_CACHE_MAX_AGE", 60))
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv("RECIPE_RESPONSE_CACHE_TIMEOUT", 5 * 60)
+)
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv("RECIPE_FRAGMENT_CACHE_TIMEOUT", 60 * 60)
+)
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", 80))
+RECIPE_IMAGE_VARIANTS = {"small": 480, "large": 1280}
+AVATAR_IMAGE_VARIANTS = {"avatar": 160}
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv("IMAGE_UPLOAD_MAX_SIZE", 10 * 1024 * 1024)
+)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", 32))
+IMAGE_QUEUE_TIMEOUT = int(os.getenv("IMAGE_QUEUE_TIMEOUT", 5))
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR") or None
 
 LANGUAGE_CODE = "ru-ru"
 TIME_ZONE = "UTC"
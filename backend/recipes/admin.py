@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Q
 from .models import (
-    Ingredient, RecipeIngredient, Recipe, ShoppingCart, Favorite
+    SEARCH_CONFIG, Ingredient, RecipeIngredient, Recipe, ShoppingCart,
+    Favorite
 )
 
 
@@ -18,15 +21,30 @@ class RecipeIngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'cooking_time', 'pub_date')
+    list_display = (
+        'name', 'author', 'cooking_time', 'pub_date', 'favorites_count'
+    )
     list_filter = ('author',)
-    search_fields = ('name', 'text')
+    search_fields = ('name',)
+    readonly_fields = ('favorites_count', 'shopping_cart_count')
     inlines = (RecipeIngredientInline,)
     date_hierarchy = 'pub_date'
 
-    def favorites_count(self, obj):
-        return obj.favorite_set.count()
-    favorites_count.short_description = 'В избранном'
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(
+            Q(name__istartswith=search_term)
+            | Q(search_vector=SearchQuery(
+                search_term, config=SEARCH_CONFIG, search_type='websearch'
+            ))
+        ), False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
 
 
 @admin.register(Favorite)
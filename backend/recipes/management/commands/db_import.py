@@ -1,60 +1,131 @@
 import os
 import csv
 import json
-from django.core.management.base import BaseCommand
+import time
+from django.core.management.base import BaseCommand, CommandError
 from recipes.models import Ingredient
 from django.conf import settings
 
 
+DEFAULT_BATCH_SIZE = 1000
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('Ожидался JSON-массив')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield item
+        if not chunk:
+            return
+
+
 class Command(BaseCommand):
     help = 'Импортирует ингредиенты из ingredients.csv или ingredients.json'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            help='Путь к файлу ингредиентов (csv или json)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT'
+        )
+
     def handle(self, *args, **kwargs):
-        if Ingredient.objects.exists():
-            self.stdout.write(
-                self.style.WARNING('Ингредиенты уже загружены. Пропуск.')
+        if kwargs['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        path = kwargs['path'] or self.find_default_path()
+        if not path:
+            self.stdout.write(self.style.ERROR(
+                'Файл ингредиентов не найден (csv или json)')
             )
             return
 
+        if path.endswith('.json'):
+            rows, source = self.read_json(path), 'JSON'
+        else:
+            rows, source = self.read_csv(path), 'CSV'
+
+        initial_count = Ingredient.objects.count()
+        started = time.monotonic()
+        processed = self.import_rows(rows, kwargs['batch_size'])
+        elapsed = max(time.monotonic() - started, 1e-6)
+        created = Ingredient.objects.count() - initial_count
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено из {source}: {processed} строк, '
+            f'новых ингредиентов: {created}, '
+            f'{processed / elapsed:.0f} строк/с')
+        )
+
+    def find_default_path(self):
         static_dir = os.path.join(settings.BASE_DIR, 'static')
-        csv_path = os.path.join(static_dir, 'ingredients.csv')
-        json_path = os.path.join(static_dir, 'ingredients.json')
+        for name in ('ingredients.json', 'ingredients.csv'):
+            path = os.path.join(static_dir, name)
+            if os.path.exists(path):
+                return path
+        return None
 
-        if os.path.exists(json_path):
-            self.load_from_json(json_path)
-        elif os.path.exists(csv_path):
-            self.load_from_csv(csv_path)
-        else:
-            self.stdout.write(self.style.ERROR(
-                'Файл ингредиентов не найден (csv или json)')
+    def import_rows(self, rows, batch_size):
+        processed = 0
+        batch = {}
+        for name, unit in rows:
+            processed += 1
+            batch[(name, unit)] = Ingredient(
+                name=name, measurement_unit=unit
             )
+            if len(batch) >= batch_size:
+                self.flush(batch)
+        self.flush(batch)
+        return processed
 
-    def load_from_csv(self, path):
-        with open(path, encoding='utf-8') as file:
-            reader = csv.reader(file)
-            count = 0
-            for row in reader:
+    def flush(self, batch):
+        if batch:
+            Ingredient.objects.bulk_create(
+                batch.values(), ignore_conflicts=True
+            )
+            batch.clear()
+
+    def read_csv(self, path):
+        with open(path, encoding='utf-8', newline='') as file:
+            for row in csv.reader(file):
                 if len(row) < 2:
                     continue
                 title, unit = row[0].strip(), row[1].strip()
-                Ingredient.objects.create(name=title, measurement_unit=unit)
-                count += 1
-        self.stdout.write(self.style.SUCCESS(
-            f'Загружено из CSV: {count} ингредиентов')
-        )
+                if title and unit:
+                    yield title, unit
 
-    def load_from_json(self, path):
+    def read_json(self, path):
         with open(path, encoding='utf-8') as file:
-            data = json.load(file)
-            count = 0
-            for item in data:
+            for item in iter_json_array(file):
                 title = item.get('name')
                 unit = item.get('measurement_unit')
                 if title and unit:
-                    Ingredient.objects.create(
-                        name=title.strip(), measurement_unit=unit.strip()
-                    )
-                    count += 1
-        self.stdout.write(self.style.SUCCESS(
-            f'Загружено из JSON: {count} ингредиентов')
-        )
+                    yield title.strip(), unit.strip()
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс рецептов'
+
+    def handle(self, *args, **kwargs):
+        updated = Recipe.objects.all().update_search_vector()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}')
+        )
@@ -0,0 +1,83 @@
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from recipes.models import Favorite, Recipe, RecipeRanking, ShoppingCart
+
+
+REFRESH_SQL = '''
+INSERT INTO {ranking} (recipe_id, popularity, trending, updated_at)
+SELECT recipe.id,
+       recipe.favorites_count * %(favorite_weight)s
+           + recipe.shopping_cart_count * %(cart_weight)s,
+       COALESCE(events.score, 0),
+       %(now)s
+FROM {recipe} AS recipe
+LEFT JOIN (
+    SELECT recipe_id,
+           SUM(weight * EXP(
+               -LN(2) * EXTRACT(EPOCH FROM (%(now)s - created_at))
+               / %(half_life)s
+           )) AS score
+    FROM (
+        SELECT recipe_id, created_at, %(favorite_weight)s AS weight
+        FROM {favorite}
+        WHERE created_at >= %(since)s
+        UNION ALL
+        SELECT recipe_id, created_at, %(cart_weight)s AS weight
+        FROM {cart}
+        WHERE created_at >= %(since)s
+    ) AS recent
+    GROUP BY recipe_id
+) AS events ON events.recipe_id = recipe.id
+ON CONFLICT (recipe_id) DO UPDATE SET
+    popularity = EXCLUDED.popularity,
+    trending = EXCLUDED.trending,
+    updated_at = EXCLUDED.updated_at
+'''
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярности и тренда рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--half-life-hours',
+            type=float,
+            default=48,
+            help='Период полураспада веса события для тренда'
+        )
+        parser.add_argument(
+            '--window-days',
+            type=float,
+            default=14,
+            help='Учитывать в тренде события не старше указанного срока'
+        )
+        parser.add_argument('--favorite-weight', type=float, default=1.0)
+        parser.add_argument('--cart-weight', type=float, default=0.5)
+
+    def handle(self, *args, **kwargs):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Команда поддерживает только PostgreSQL')
+        if kwargs['half_life_hours'] <= 0:
+            raise CommandError('--half-life-hours должен быть больше 0')
+        now = timezone.now()
+        sql = REFRESH_SQL.format(
+            ranking=RecipeRanking._meta.db_table,
+            recipe=Recipe._meta.db_table,
+            favorite=Favorite._meta.db_table,
+            cart=ShoppingCart._meta.db_table,
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'now': now,
+                'since': now - timezone.timedelta(
+                    days=kwargs['window_days']
+                ),
+                'half_life': kwargs['half_life_hours'] * 3600,
+                'favorite_weight': kwargs['favorite_weight'],
+                'cart_weight': kwargs['cart_weight'],
+            })
+            refreshed = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рейтингов: {refreshed}')
+        )
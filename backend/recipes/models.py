@@ -1,7 +1,15 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Coalesce, RowNumber
 from django.core.validators import MinValueValidator
-from users.models import FoodgramUser
+from users.models import FoodgramUser, RelationQuerySet, Subscription
 from django.conf import settings
+from django.utils import timezone
+
+
+SEARCH_CONFIG = 'russian'
 
 
 class Ingredient(models.Model):
@@ -10,6 +18,12 @@ class Ingredient(models.Model):
 
     class Meta:
         verbose_name = 'Ингредиент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit',
+            )
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.measurement_unit})'
@@ -38,6 +52,98 @@ class RecipeIngredient(models.Model):
                 name="unique_recipe_ingredient",
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["ingredient", "recipe"],
+                name="ingredient_recipe_idx",
+            )
+        ]
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        if not user or not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+                author_is_subscribed=models.Value(False),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            author_is_subscribed=models.Exists(Subscription.objects.filter(
+                subscriber=user, author=models.OuterRef('author')
+            )),
+        )
+
+    def limited_per_author(self, author_ids, limit=None):
+        queryset = self.filter(author_id__in=author_ids)
+        if limit is None:
+            return queryset
+        return queryset.annotate(
+            author_row_number=models.Window(
+                RowNumber(),
+                partition_by=models.F('author_id'),
+                order_by=(
+                    models.F('pub_date').desc(), models.F('id').desc()
+                ),
+            )
+        ).filter(author_row_number__lte=limit)
+
+    def with_ingredient_coverage(self, ingredient_ids):
+        components = RecipeIngredient.objects.filter(
+            recipe=models.OuterRef('pk')
+        ).order_by().values('recipe')
+        return self.filter(pk__in=RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredient_ids
+        ).values('recipe_id')).annotate(
+            ingredients_total=models.Subquery(components.annotate(
+                total=models.Count('pk')
+            ).values('total')),
+            ingredients_matched=models.Subquery(components.filter(
+                ingredient_id__in=ingredient_ids
+            ).annotate(
+                total=models.Count('pk')
+            ).values('total')),
+            ingredients_missing=(
+                models.F('ingredients_total')
+                - models.F('ingredients_matched')
+            ),
+            ingredients_coverage=models.ExpressionWrapper(
+                models.F('ingredients_matched') * 1.0
+                / models.F('ingredients_total'),
+                output_field=models.FloatField()
+            ),
+        )
+
+    def update_search_vector(self):
+        ingredient_names = RecipeIngredient.objects.filter(
+            recipe=models.OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', delimiter=' ')
+        ).values('names')
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(
+                Coalesce(
+                    models.Subquery(ingredient_names),
+                    models.Value(''),
+                    output_field=models.TextField()
+                ),
+                weight='C',
+                config=SEARCH_CONFIG
+            )
+        ))
+
+    def for_display(self, user):
+        return self.with_user_flags(user).select_related(
+            'author'
+        ).defer('search_vector')
 
 
 class Recipe(models.Model):
@@ -61,19 +167,42 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         'Дата и время публикации', auto_now_add=True
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'В списках покупок', default=0, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         ordering = ('-pub_date',)
-
-    @property
-    def favorites_count(self):
-        return self.favorite_set.count()
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.label
 
 
+class UserRecipeQuerySet(RelationQuerySet):
+    owner_field = 'user'
+    target_field = 'recipe'
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -85,6 +214,11 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites'
     )
+    created_at = models.DateTimeField(
+        'Добавлено', default=timezone.now, db_index=True
+    )
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Избранный рецепт'
@@ -103,8 +237,38 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_cart_items'
     )
+    created_at = models.DateTimeField(
+        'Добавлено', default=timezone.now, db_index=True
+    )
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт в корзине'
         verbose_name_plural = 'Рецепты в корзине'
         unique_together = ('user', 'recipe')
+
+
+class RecipeRanking(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking'
+    )
+    popularity = models.FloatField('Популярность', default=0)
+    trending = models.FloatField('Тренд', default=0)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(
+                fields=['-popularity', '-recipe'],
+                name='ranking_popularity_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'], name='ranking_trending_idx'
+            ),
+        ]
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import FoodgramUser, relations_changed
+from .models import (
+    Favorite, Ingredient, Recipe, RecipeRanking, ShoppingCart
+)
+
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+def adjust_counter(model, pk, field, delta):
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    adjust_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increment_shopping_cart_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(Recipe, instance.recipe_id, 'shopping_cart_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_shopping_cart_count(sender, instance, **kwargs):
+    adjust_counter(Recipe, instance.recipe_id, 'shopping_cart_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(FoodgramUser, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_ranking(sender, instance, created, **kwargs):
+    if created:
+        RecipeRanking.objects.get_or_create(recipe=instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    adjust_counter(FoodgramUser, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search(sender, instance, created, **kwargs):
+    if not created:
+        recipes = Recipe.objects.filter(ingredients=instance)
+        recipes.update_search_vector()
+        recipes.update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, **kwargs):
+    recipe_ids = list(Recipe.objects.filter(
+        ingredients=instance
+    ).values_list('id', flat=True))
+    if not recipe_ids:
+        return
+    recipes = Recipe.objects.filter(id__in=recipe_ids)
+    recipes.update(updated_at=timezone.now())
+    transaction.on_commit(recipes.update_search_vector)
+
+
+@receiver(relations_changed)
+def update_recipe_counters(sender, target_ids, added, **kwargs):
+    field = RECIPE_COUNTERS.get(sender)
+    if field:
+        Recipe.objects.filter(pk__in=target_ids).update(
+            **{field: Greatest(F(field) + (1 if added else -1), 0)}
+        )
@@ -5,9 +5,11 @@ from .models import FoodgramUser, Subscription
 
 @admin.register(FoodgramUser)
 class FoodgramUserAdmin(UserAdmin):
-    list_display = ("email", "username", "is_staff")
+    list_display = (
+        "email", "username", "is_staff", "recipes_count", "followers_count"
+    )
     search_fields = ("email", "username")
-    readonly_fields = ("date_joined",)
+    readonly_fields = ("date_joined", "recipes_count", "followers_count")
     fieldsets = (
         (None, {"fields": ("email", "password")}),
         ("Персональные данные", {"fields": ("username", "profile_image")}),
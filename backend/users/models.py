@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import connections, models, transaction
+from django.dispatch import Signal
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 import re
@@ -10,6 +11,77 @@ USERNAME_LENGTH = 150
 NAME_LENGTH = 150
 
 
+relations_changed = Signal()
+
+
+class RelationQuerySet(models.QuerySet):
+    owner_field = None
+    target_field = None
+
+    def add(self, owner, target_ids):
+        target_ids = list(dict.fromkeys(target_ids))
+        if not target_ids:
+            return []
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        fields = [
+            field for field in self.model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        params = []
+        for pk in target_ids:
+            obj = self.model(**{
+                self.owner_field: owner, f'{self.target_field}_id': pk
+            })
+            params.extend(
+                field.get_db_prep_save(field.pre_save(obj, True), connection)
+                for field in fields
+            )
+        row = f'({", ".join(["%s"] * len(fields))})'
+        return self.execute_returning(
+            f'INSERT INTO {quote(self.model._meta.db_table)} '
+            f'({", ".join(quote(field.column) for field in fields)}) '
+            f'VALUES {", ".join([row] * len(target_ids))} '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(f"{self.target_field}_id")}',
+            params, owner, True
+        )
+
+    def remove(self, owner, target_ids):
+        target_ids = list(dict.fromkeys(target_ids))
+        if not target_ids:
+            return []
+        quote = connections[self.db].ops.quote_name
+        target_column = quote(f'{self.target_field}_id')
+        return self.execute_returning(
+            f'DELETE FROM {quote(self.model._meta.db_table)} '
+            f'WHERE {quote(f"{self.owner_field}_id")} = %s '
+            f'AND {target_column} IN '
+            f'({", ".join(["%s"] * len(target_ids))}) '
+            f'RETURNING {target_column}',
+            [owner.pk, *target_ids], owner, False
+        )
+
+    def execute_returning(self, sql, params, owner, added):
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(sql, params)
+                target_ids = [row[0] for row in cursor.fetchall()]
+            if target_ids:
+                relations_changed.send(
+                    sender=self.model,
+                    owner_id=owner.pk,
+                    target_ids=target_ids,
+                    added=added,
+                )
+        return target_ids
+
+
+class SubscriptionQuerySet(RelationQuerySet):
+    owner_field = 'subscriber'
+    target_field = 'author'
+
+
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -59,6 +131,16 @@ class FoodgramUser(AbstractUser):
         blank=False,
         verbose_name="Фамилия"
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Рецептов"
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Подписчиков"
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
@@ -92,6 +174,8 @@ class Subscription(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = SubscriptionQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         constraints = [
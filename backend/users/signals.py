@@ -0,0 +1,28 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FoodgramUser, Subscription, relations_changed
+
+
+def adjust_followers_count(author_ids, delta):
+    FoodgramUser.objects.filter(pk__in=author_ids).update(
+        followers_count=Greatest(F('followers_count') + delta, 0)
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_followers_count([instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_followers_count(sender, instance, **kwargs):
+    adjust_followers_count([instance.author_id], -1)
+
+
+@receiver(relations_changed, sender=Subscription)
+def update_followers_counts(sender, target_ids, added, **kwargs):
+    adjust_followers_count(target_ids, 1 if added else -1)